@@ -0,0 +1,24 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""
+BS2PRO 通知数据包解析 (Cython 加速版)
+构建: python setup.py build_ext --inplace
+未编译时 ble_read.py 会自动回退到纯 Python 实现
+"""
+
+
+cpdef tuple parse_frame(const unsigned char[::1] data):
+    """
+    解析数据帧，返回 (帧头, 命令字, 目标转速, 实际转速)
+    0-1字节: 帧头 (大端 uint16)
+    2字节: 命令字
+    8-9字节: 目标转速 (大端 uint16)
+    10-11字节: 实际转速 (大端 uint16)
+    """
+    if data.shape[0] < 12:
+        raise ValueError(f"数据包长度不足: {data.shape[0]} 字节 (需要至少12字节)")
+    return (
+        (data[0] << 8) | data[1],
+        data[2],
+        (data[8] << 8) | data[9],
+        (data[10] << 8) | data[11],
+    )
@@ -5,10 +5,13 @@ FlyDigi BS2PRO 蓝牙设备数据读取脚本
 """
 
 import asyncio
+import collections
+import logging
 import struct
 import signal
 import sys
-from typing import Optional
+import time
+from typing import List, Optional, Tuple
 from bleak import BleakClient, BleakScanner
 from bleak.backends.device import BLEDevice
 
@@ -18,113 +21,209 @@ VENDOR_PREFIXES = {
     "00:00:00": "Unknown",
     # 可以添加更多厂商前缀
 }
+# 查询用的前缀表，键统一为小写
+_VENDOR_BY_PREFIX = {
+    prefix.lower(): vendor for prefix, vendor in VENDOR_PREFIXES.items()
+}
+# 表中出现的前缀长度，从长到短 (兼容 IEEE MA-M "xx:xx:xx:x" / MA-S "xx:xx:xx:xx:x" 前缀)
+_VENDOR_PREFIX_LENGTHS = tuple(
+    sorted({len(p) for p in _VENDOR_BY_PREFIX}, reverse=True)
+)
 
 # 设备配置
 TARGET_DEVICE_NAME = "FlyDigi BS2PRO"
 # 目标特性UUID - 从设备发现中找到的自定义特性
 TARGET_CHARACTERISTIC_UUID = "0000fff1-0000-1000-8000-00805f9b34fb"
 SCAN_TIMEOUT = 5.0  # 扫描超时时间（秒）
+LOG_QUEUE_SIZE = 1024  # 通知日志队列容量，满时丢弃最旧的记录
+LOG_LEVEL = logging.INFO  # 设为 logging.DEBUG 可输出特性信息与原始数据包
+
+logger = logging.getLogger(__name__)
+
+# 数据帧格式: 帧头 5aa5 (2) + 命令 (1) + 未解析字段 (5) + 目标转速 (2) + 实际转速 (2)
+FRAME_HEADER = 0x5AA5
+FAN_DATA_COMMAND = 0xEF  # 风扇数据帧命令字
+FRAME_STRUCT = struct.Struct(">HB5xHH")
+
+# 优先使用 Cython 编译的解析函数 (见 _ble_parse.pyx)，未编译时回退到纯 Python
+try:
+    from _ble_parse import parse_frame
+except ImportError:
+    # 一次 C 调用解出整个帧头，不经过 Python 函数帧
+    parse_frame = FRAME_STRUCT.unpack_from
 
 
 class BS2PROMonitor:
+    # 固定实例属性，通知回调中的属性访问走槽位而非实例字典
+    __slots__ = (
+        "client",
+        "device",
+        "running",
+        "_stop_event",
+        "_q",
+        "_wakeup",
+        "_parse_frame",
+        "_clock",
+        "_enqueue",
+        "_notify_drain",
+    )
+
     def __init__(self):
         self.client: Optional[BleakClient] = None
         self.device: Optional[BLEDevice] = None
         self.running = False
+        # 停止事件：监控期间主协程挂起等待，收到停止请求时立即唤醒
+        self._stop_event = asyncio.Event()
+        # 通知回调只负责入队，由后台任务统一输出，避免阻塞 BLE 回调
+        self._q = collections.deque(maxlen=LOG_QUEUE_SIZE)
+        self._wakeup = asyncio.Event()
+        # 预先绑定通知回调中用到的方法，减少每次回调的属性查找
+        self._parse_frame = parse_frame
+        self._clock = time.monotonic_ns
+        self._enqueue = self._q.append
+        self._notify_drain = self._wakeup.set
 
     def get_vendor_from_mac(self, mac_address: str) -> str:
         """根据MAC地址前缀获取厂商信息"""
-        mac_prefix = mac_address.lower()[:8]  # 取前3字节
-        return VENDOR_PREFIXES.get(mac_prefix, "Unknown")
-
-    def parse_speed_data(self, data: bytearray) -> tuple:
+        # 按前缀长度从长到短做最长前缀匹配，每种长度只需一次字典查询
+        mac_address = mac_address[: _VENDOR_PREFIX_LENGTHS[0]].lower()
+        for length in _VENDOR_PREFIX_LENGTHS:
+            vendor = _VENDOR_BY_PREFIX.get(mac_address[:length])
+            if vendor is not None:
+                return vendor
+        return "Unknown"
+
+    def parse_speed_data(self, data: bytearray) -> Tuple[Optional[int], Optional[int]]:
         """
-        解析转速数据
+        解析转速数据，无法解析时返回 (None, None)
         根据数据包格式: 5aa5ef0b4a0705e40ce40cfb002b00000000000000000000
+        0-1字节: 帧头 5aa5
+        2字节: 命令字 (ef 为风扇数据帧)
         8-9字节: 目标转速 (大端 uint16)
         10-11字节: 实际转速 (大端 uint16)
         """
-        if len(data) < 12:
-            print(f"数据包长度不足: {len(data)} 字节 (需要至少12字节)")
+        if len(data) < FRAME_STRUCT.size:
             return None, None
 
-        print(f"原始数据包: {data.hex()}")
-
-        try:
-            # 提取目标转速 (字节8-9, 大端序)
-            target_speed_bytes = data[8:10]
-            target_speed = struct.unpack(">H", target_speed_bytes)[0]
-            print(f"目标转速字节 [8-9]: {target_speed_bytes.hex()} -> {target_speed}")
-
-            # 提取实际转速 (字节10-11, 大端序)
-            actual_speed_bytes = data[10:12]
-            actual_speed = struct.unpack(">H", actual_speed_bytes)[0]
-            print(f"实际转速字节 [10-11]: {actual_speed_bytes.hex()} -> {actual_speed}")
-
-            return target_speed, actual_speed
-        except struct.error as e:
-            print(f"数据解析错误: {e}")
+        header, command, target_speed, actual_speed = self._parse_frame(data)
+        if header != FRAME_HEADER or command != FAN_DATA_COMMAND:
             return None, None
 
+        return target_speed, actual_speed
+
     def notification_handler(self, characteristic, data: bytearray):
-        """处理接收到的通知数据"""
-        # 获取特性的handle
-        handle = characteristic.handle if hasattr(characteristic, "handle") else "未知"
-        uuid = (
-            str(characteristic.uuid).lower()
-            if hasattr(characteristic, "uuid")
-            else "未知"
-        )
-
-        print("\n=== 收到通知 ===")
-        print(f"特性UUID: {uuid}")
-        print(f"Handle: 0x{handle:04x}")
-        print(f"数据长度: {len(data)} 字节")
-        print(f"原始数据: {data.hex()}")
-
-        # 尝试解析转速数据（针对所有通知特性）
+        """处理接收到的通知数据（仅解析并入队，不做任何输出）"""
         target_speed, actual_speed = self.parse_speed_data(data)
+        self._enqueue((self._clock(), characteristic, data, target_speed, actual_speed))
+        self._notify_drain()
+
+    @staticmethod
+    def _format_notification(
+        timestamp_ns: int,
+        characteristic,
+        data: bytearray,
+        target_speed,
+        actual_speed,
+        verbose: bool = False,
+    ) -> str:
+        """将一条通知记录格式化为输出文本，verbose 时附带特性信息与原始数据"""
+        lines = [f"\n=== 收到通知 @ {timestamp_ns / 1e9:.3f}s ==="]
+        if verbose:
+            handle = getattr(characteristic, "handle", None)
+            uuid = (
+                str(characteristic.uuid).lower()
+                if hasattr(characteristic, "uuid")
+                else "未知"
+            )
+            lines.append(f"特性UUID: {uuid}")
+            lines.append(
+                f"Handle: 0x{handle:04x}" if handle is not None else "Handle: 未知"
+            )
+            lines.append(f"数据长度: {len(data)} 字节")
+            lines.append(f"原始数据: {data.hex()}")
         if target_speed is not None and actual_speed is not None:
-            print(f"🎯 目标转速: {target_speed} RPM")
-            print(f"⚡ 实际转速: {actual_speed} RPM")
-            print(f"📊 转速差: {actual_speed - target_speed} RPM")
-            print("-" * 50)
+            lines.append(f"🎯 目标转速: {target_speed} RPM")
+            lines.append(f"⚡ 实际转速: {actual_speed} RPM")
+            lines.append(f"📊 转速差: {actual_speed - target_speed} RPM")
         else:
-            print("❌ 无法解析为转速数据")
-            print("-" * 50)
+            lines.append(f"❌ 无法解析为转速数据 (长度 {len(data)} 字节)")
+        lines.append("-" * 50)
+        return "\n".join(lines)
+
+    def _flush_logs(self):
+        """一次性输出队列中所有待输出的通知"""
+        q = self._q
+        if not q:
+            return
+        # 日志级别不足时直接丢弃，不做任何格式化
+        if not logger.isEnabledFor(logging.INFO):
+            q.clear()
+            return
+        verbose = logger.isEnabledFor(logging.DEBUG)
+        entries = []
+        while q:
+            entries.append(self._format_notification(*q.popleft(), verbose))
+        logger.info("%s", "\n".join(entries))
+
+    async def _drain_logs(self):
+        """后台日志任务：等待通知入队后批量输出"""
+        try:
+            while True:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                self._flush_logs()
+        finally:
+            self._flush_logs()
 
     async def scan_devices(self) -> Optional[BLEDevice]:
-        """扫描蓝牙设备"""
-        print(f"正在扫描蓝牙设备 ({SCAN_TIMEOUT}秒)...")
-
-        # 获取已发现的设备
-        devices = await BleakScanner.discover(timeout=SCAN_TIMEOUT)
-
-        print(f"\n发现 {len(devices)} 个蓝牙设备:")
+        """扫描蓝牙设备，发现目标设备后立即停止扫描"""
+        print(f"正在扫描蓝牙设备 (最长 {SCAN_TIMEOUT} 秒)...")
         print("-" * 60)
 
+        seen_addresses = set()
         target_device = None
+        found_event = asyncio.Event()
+
+        def detection_callback(device: BLEDevice, advertisement_data):
+            nonlocal target_device
+
+            is_target = target_device is None and device.name == TARGET_DEVICE_NAME
+            if is_target:
+                target_device = device
+                found_event.set()
+            elif device.address in seen_addresses:
+                return
+            seen_addresses.add(device.address)
 
-        for device in devices:
             vendor = self.get_vendor_from_mac(device.address)
             device_name = device.name or "未知设备"
-
-            # 显示设备信息
-            print(f"设备名称: {device_name}")
-            print(f"MAC地址: {device.address}")
-            print(f"厂商: {vendor}")
             # RSSI可能不是所有平台都有
-            try:
-                print(f"RSSI: {getattr(device, 'rssi', '未知')} dBm")
-            except Exception:
-                print("RSSI: 未知")
-
-            # 检查是否为目标设备
-            if device.name == TARGET_DEVICE_NAME:
-                target_device = device
-                print("*** 这是目标设备 ***")
+            rssi = getattr(advertisement_data, "rssi", None)
+            if rssi is None:
+                rssi = getattr(device, "rssi", "未知")
+
+            # 显示设备信息，拼接后一次性输出
+            lines = [
+                f"设备名称: {device_name}",
+                f"MAC地址: {device.address}",
+                f"厂商: {vendor}",
+                f"RSSI: {rssi} dBm",
+            ]
+            if is_target:
+                lines.append("*** 这是目标设备 ***")
+            lines.append("-" * 60)
+            print("\n".join(lines))
+
+        scanner = BleakScanner(detection_callback=detection_callback)
+        await scanner.start()
+        try:
+            await asyncio.wait_for(found_event.wait(), SCAN_TIMEOUT)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            await scanner.stop()
 
-            print("-" * 60)
+        print(f"\n共发现 {len(seen_addresses)} 个蓝牙设备")
 
         if target_device:
             print(f"找到目标设备: {target_device.name} ({target_device.address})")
@@ -133,6 +232,43 @@ class BS2PROMonitor:
 
         return target_device
 
+    def _find_notify_handles(self, services) -> List[int]:
+        """
+        遍历服务查找通知特性
+        返回待监听的 Handle 列表，首个为选中的特性，其后最多额外2个
+        """
+        service_count = len(services.services) if hasattr(services, "services") else 0
+        print(f"设备服务数量: {service_count}")
+
+        notification_chars = []
+        target_char = None
+        target_uuid = TARGET_CHARACTERISTIC_UUID.lower()
+
+        for service in services:
+            print(f"\n服务: {service.uuid}")
+            for char in service.characteristics:
+                print(
+                    f"  特性: {char.uuid} (Handle: 0x{char.handle:04x}) 属性: {char.properties}"
+                )
+                if "notify" in char.properties:
+                    print(
+                        f"  *** 找到通知特性: {char.uuid} (Handle: 0x{char.handle:04x}) ***"
+                    )
+                    notification_chars.append(char)
+                    # 优先使用目标UUID的特性
+                    if str(char.uuid).lower() == target_uuid:
+                        target_char = char
+                        print("  *** 这是目标通知特性 ***")
+
+        if not notification_chars:
+            return []
+
+        # 使用目标特性，如果没有则使用第一个可用的
+        selected_char = target_char if target_char else notification_chars[0]
+        other_chars = [char for char in notification_chars if char != selected_char]
+        # 最多监听额外2个特性
+        return [selected_char.handle] + [char.handle for char in other_chars[:2]]
+
     async def connect_and_monitor(self, device: BLEDevice):
         """连接设备并开始监控"""
         print(f"正在连接到设备: {device.name} ({device.address})")
@@ -142,74 +278,49 @@ class BS2PROMonitor:
                 self.client = client
                 print(f"成功连接到 {device.name}")
 
-                # 获取设备服务信息
-                services = client.services
-                service_count = (
-                    len(services.services) if hasattr(services, "services") else 0
-                )
-                print(f"设备服务数量: {service_count}")
-
-                # 查找所有通知特性
-                notification_chars = []
-                target_char = None
-
-                for service in services:
-                    print(f"\n服务: {service.uuid}")
-                    for char in service.characteristics:
-                        print(
-                            f"  特性: {char.uuid} (Handle: 0x{char.handle:04x}) 属性: {char.properties}"
-                        )
-                        if "notify" in char.properties:
-                            print(
-                                f"  *** 找到通知特性: {char.uuid} (Handle: 0x{char.handle:04x}) ***"
-                            )
-                            notification_chars.append(char)
-                            # 优先使用目标UUID的特性
-                            if (
-                                str(char.uuid).lower()
-                                == TARGET_CHARACTERISTIC_UUID.lower()
-                            ):
-                                target_char = char
-                                print("  *** 这是目标通知特性 ***")
-
-                if notification_chars:
-                    # 使用目标特性，如果没有则使用第一个可用的
-                    selected_char = (
-                        target_char if target_char else notification_chars[0]
-                    )
-
-                    print(
-                        f"\n选择监听特性: {selected_char.uuid} (Handle: 0x{selected_char.handle:04x})"
-                    )
-                    await client.start_notify(selected_char, self.notification_handler)
+                notify_handles = self._find_notify_handles(client.services)
 
+                if notify_handles:
+                    selected_handle = notify_handles[0]
+                    print(f"\n选择监听特性: Handle 0x{selected_handle:04x}")
                     # 如果有多个通知特性，也尝试监听其他的
-                    other_chars = [
-                        char for char in notification_chars if char != selected_char
-                    ]
-                    for char in other_chars[:2]:  # 最多监听额外2个特性
-                        try:
-                            print(
-                                f"同时监听: {char.uuid} (Handle: 0x{char.handle:04x})"
-                            )
-                            await client.start_notify(char, self.notification_handler)
-                        except Exception as e:
-                            print(f"监听特性 {char.uuid} 失败: {e}")
+                    for handle in notify_handles[1:]:
+                        print(f"同时监听: Handle 0x{handle:04x}")
+
+                    # 并发订阅所有通知特性，只需等待一次往返
+                    results = await asyncio.gather(
+                        *(
+                            client.start_notify(handle, self.notification_handler)
+                            for handle in notify_handles
+                        ),
+                        return_exceptions=True,
+                    )
+                    if isinstance(results[0], Exception):
+                        raise results[0]
+                    for handle, result in zip(notify_handles[1:], results[1:]):
+                        if isinstance(result, Exception):
+                            print(f"监听特性 0x{handle:04x} 失败: {result}")
 
                     print("\n🚀 监控已启动，按 Ctrl+C 退出...")
                     print("📡 等待转速数据...")
                     self.running = True
+                    log_task = asyncio.create_task(self._drain_logs())
 
                     # 保持连接并监听数据
-                    while self.running:
-                        await asyncio.sleep(1)
-
-                    # 停止所有通知
-                    for char in notification_chars:
+                    try:
+                        await self._stop_event.wait()
+                    finally:
+                        log_task.cancel()
                         try:
-                            await client.stop_notify(char)
-                        except Exception:
+                            await log_task
+                        except asyncio.CancelledError:
                             pass
+
+                    # 并发停止所有通知，忽略单个特性的失败
+                    await asyncio.gather(
+                        *(client.stop_notify(handle) for handle in notify_handles),
+                        return_exceptions=True,
+                    )
                     print("已停止监控")
                 else:
                     print("未找到可用的通知特性")
@@ -222,19 +333,30 @@ class BS2PROMonitor:
         """停止监控"""
         self.running = False
         print("正在停止监控...")
+        self._stop_event.set()
 
 
 async def main():
     """主函数"""
     monitor = BS2PROMonitor()
+    loop = asyncio.get_running_loop()
 
     # 设置信号处理器
-    def signal_handler(signum, frame):
+    def request_stop():
         print("\n接收到退出信号")
         monitor.stop_monitoring()
 
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
+    def signal_handler(signum, frame):
+        # 通过 call_soon_threadsafe 唤醒事件循环，立即处理停止请求
+        loop.call_soon_threadsafe(request_stop)
+
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            # 由事件循环直接处理信号
+            loop.add_signal_handler(sig, request_stop)
+        except NotImplementedError:
+            # Windows 不支持 add_signal_handler，退回普通信号处理器
+            signal.signal(sig, signal_handler)
 
     try:
         # 扫描设备
@@ -269,6 +391,9 @@ if __name__ == "__main__":
         print("请运行: pip install bleak")
         sys.exit(1)
 
+    logging.basicConfig(stream=sys.stdout, format="%(message)s")
+    logger.setLevel(LOG_LEVEL)
+
     # 运行主程序
     exit_code = asyncio.run(main())
     sys.exit(exit_code)
@@ -1,4 +1,6 @@
 import asyncio
+import json
+import os
 from winrt.windows.devices.bluetooth import BluetoothLEDevice, BluetoothCacheMode
 from winrt.windows.devices.bluetooth.genericattributeprofile import (
     GattCharacteristicProperties,
@@ -6,6 +8,13 @@ from winrt.windows.devices.bluetooth.genericattributeprofile import (
 from winrt.windows.storage.streams import DataWriter, Buffer
 from winrt.windows.devices.enumeration import DeviceInformation
 
+# GATT 服务缓存记录：已成功枚举过服务的设备地址，再次运行时优先使用系统缓存
+SERVICE_CACHE_FILE = os.path.join(
+    os.environ.get("LOCALAPPDATA") or os.path.expanduser("~"),
+    "BS2PRO-Controller",
+    "gatt_service_cache.json",
+)
+
 # 添加 HID 支持
 try:
     import hid
@@ -20,11 +29,11 @@ except ImportError:
 async def find_paired_ble_devices():
     """查找所有已配对的 BLE 设备"""
     try:
-        # 使用设备枚举器查找所有 BLE 设备
-        device_selector = BluetoothLEDevice.get_device_selector()
-        devices = await DeviceInformation.find_all_async()
+        # 只枚举已配对的 BLE 设备，由系统完成过滤
+        device_selector = BluetoothLEDevice.get_device_selector_from_pairing_state(True)
+        devices = await DeviceInformation.find_all_async(device_selector, [])
 
-        print(f"找到 {len(devices)} 个 BLE 设备:")
+        print(f"找到 {len(devices)} 个已配对的 BLE 设备:")
 
         for device in devices:
             if device.name:  # 只显示有名称的设备
@@ -46,29 +55,39 @@ async def find_paired_ble_devices():
         return None
 
 
+# 特征值属性位 -> 名称
+_PROP_TABLE = (
+    (GattCharacteristicProperties.READ, "READ"),
+    (GattCharacteristicProperties.WRITE, "WRITE"),
+    (GattCharacteristicProperties.WRITE_WITHOUT_RESPONSE, "WRITE_NO_RESPONSE"),
+    (GattCharacteristicProperties.NOTIFY, "NOTIFY"),
+    (GattCharacteristicProperties.INDICATE, "INDICATE"),
+    (GattCharacteristicProperties.BROADCAST, "BROADCAST"),
+    (GattCharacteristicProperties.EXTENDED_PROPERTIES, "EXTENDED"),
+    (GattCharacteristicProperties.AUTHENTICATED_SIGNED_WRITES, "AUTH_SIGNED_WRITES"),
+)
+
+# 特征值属性位 -> 读写能力描述
+_CAPABILITY_TABLE = (
+    (GattCharacteristicProperties.READ, "✅ 可读"),
+    (
+        GattCharacteristicProperties.WRITE
+        | GattCharacteristicProperties.WRITE_WITHOUT_RESPONSE,
+        "✏️ 可写",
+    ),
+    (GattCharacteristicProperties.NOTIFY, "🔔 可通知"),
+    (GattCharacteristicProperties.INDICATE, "📢 可指示"),
+)
+
+
 def analyze_characteristic_properties(properties):
     """分析特征值属性"""
-    prop_list = []
-
-    # 使用 GattCharacteristicProperties 枚举值
-    if properties & GattCharacteristicProperties.READ:
-        prop_list.append("READ")
-    if properties & GattCharacteristicProperties.WRITE:
-        prop_list.append("WRITE")
-    if properties & GattCharacteristicProperties.WRITE_WITHOUT_RESPONSE:
-        prop_list.append("WRITE_NO_RESPONSE")
-    if properties & GattCharacteristicProperties.NOTIFY:
-        prop_list.append("NOTIFY")
-    if properties & GattCharacteristicProperties.INDICATE:
-        prop_list.append("INDICATE")
-    if properties & GattCharacteristicProperties.BROADCAST:
-        prop_list.append("BROADCAST")
-    if properties & GattCharacteristicProperties.EXTENDED_PROPERTIES:
-        prop_list.append("EXTENDED")
-    if properties & GattCharacteristicProperties.AUTHENTICATED_SIGNED_WRITES:
-        prop_list.append("AUTH_SIGNED_WRITES")
-
-    return prop_list
+    return [name for mask, name in _PROP_TABLE if properties & mask]
+
+
+def analyze_characteristic_capabilities(properties):
+    """分析特征值读写能力"""
+    return [desc for mask, desc in _CAPABILITY_TABLE if properties & mask]
 
 
 def get_service_description(uuid_str):
@@ -88,6 +107,72 @@ def format_gatt_status(code: int) -> str:
     return mapping.get(int(code), f"Unknown({code})")
 
 
+async def get_characteristics(service, cache_mode=BluetoothCacheMode.UNCACHED):
+    """获取服务的特征值，使用缓存模式失败时回退到从设备读取"""
+    try:
+        if cache_mode == BluetoothCacheMode.CACHED:
+            char_result = await service.get_characteristics_async(cache_mode)
+            if char_result.status == 0:
+                return char_result
+        return await service.get_characteristics_async(BluetoothCacheMode.UNCACHED)
+    except TypeError:
+        return await service.get_characteristics_async()
+
+
+async def get_descriptor_count(char) -> int:
+    """获取特征值的描述符数量，失败时返回0"""
+    try:
+        descriptors_result = await char.get_descriptors_async()
+        if descriptors_result.status == 0:
+            return len(descriptors_result.descriptors)
+    except:  # noqa: E722
+        pass
+    return 0
+
+
+def load_service_cache() -> set:
+    """读取已缓存服务的设备地址"""
+    try:
+        with open(SERVICE_CACHE_FILE, "r", encoding="utf-8") as f:
+            return set(json.load(f))
+    except (OSError, ValueError, TypeError):
+        return set()
+
+
+def save_service_cache(addresses: set):
+    """保存已缓存服务的设备地址"""
+    try:
+        os.makedirs(os.path.dirname(SERVICE_CACHE_FILE), exist_ok=True)
+        with open(SERVICE_CACHE_FILE, "w", encoding="utf-8") as f:
+            json.dump(sorted(addresses), f)
+    except OSError as e:
+        print(f"保存服务缓存记录失败: {e}")
+
+
+async def get_gatt_services(device):
+    """获取GATT服务，设备曾成功枚举过时使用系统缓存，缓存无效时回退到从设备读取
+
+    返回 (GATT服务结果, 实际使用的缓存模式)，特征值按同一模式读取
+    """
+    address = hex(device.bluetooth_address)
+    cached_addresses = load_service_cache()
+
+    if address in cached_addresses:
+        gatt_result = await device.get_gatt_services_async(BluetoothCacheMode.CACHED)
+        if gatt_result.status == 0 and len(gatt_result.services) > 0:
+            print("📦 使用缓存的服务信息")
+            return gatt_result, BluetoothCacheMode.CACHED
+        print("缓存的服务信息无效，重新从设备读取...")
+        cached_addresses.discard(address)
+        save_service_cache(cached_addresses)
+
+    gatt_result = await device.get_gatt_services_async(BluetoothCacheMode.UNCACHED)
+    if gatt_result.status == 0 and len(gatt_result.services) > 0:
+        cached_addresses.add(address)
+        save_service_cache(cached_addresses)
+    return gatt_result, BluetoothCacheMode.UNCACHED
+
+
 async def discover_services_and_characteristics(device):
     """发现设备的所有服务和特征值"""
     try:
@@ -96,7 +181,7 @@ async def discover_services_and_characteristics(device):
         print("=" * 60)
 
         # 获取GATT服务
-        gatt_result = await device.get_gatt_services_async()
+        gatt_result, cache_mode = await get_gatt_services(device)
 
         if gatt_result.status != 0:
             print(f"获取服务失败，状态码: {gatt_result.status}")
@@ -105,61 +190,52 @@ async def discover_services_and_characteristics(device):
         services = gatt_result.services
         print(f"📋 找到 {len(services)} 个服务:\n")
 
-        for i, service in enumerate(services, 1):
-            service_uuid = str(service.uuid)
+        # 并发获取所有服务的特征值，再并发获取所有特征值的描述符
+        char_results = await asyncio.gather(
+            *(get_characteristics(service, cache_mode) for service in services),
+            return_exceptions=True,
+        )
+        all_chars = [
+            char
+            for char_result in char_results
+            if not isinstance(char_result, Exception) and char_result.status == 0
+            for char in char_result.characteristics
+        ]
+        descriptor_counts = await asyncio.gather(
+            *(get_descriptor_count(char) for char in all_chars)
+        )
+        descriptor_count_iter = iter(descriptor_counts)
+
+        for i, (service, char_result) in enumerate(zip(services, char_results), 1):
+            service_uuid = str(service.uuid).lower()
             service_desc = get_service_description(service_uuid)
 
             print(f"🔧 服务 {i}: {service_desc}")
             print(f"   UUID: {service_uuid}")
 
-            # 获取特征值（尝试使用未缓存模式）
-            try:
-                char_result = await service.get_characteristics_async(
-                    BluetoothCacheMode.UNCACHED
-                )
-            except TypeError:
-                char_result = await service.get_characteristics_async()
-
-            if char_result.status == 0:
+            if isinstance(char_result, Exception):
+                print(f"   ❌ 无法获取特征值: {char_result}")
+            elif char_result.status == 0:
                 characteristics = char_result.characteristics
                 print(f"   📊 特征值数量: {len(characteristics)}")
 
                 for j, char in enumerate(characteristics, 1):
                     char_uuid = str(char.uuid)
-                    properties = analyze_characteristic_properties(
-                        char.characteristic_properties
-                    )
+                    char_props = char.characteristic_properties
+                    properties = analyze_characteristic_properties(char_props)
 
                     print(f"      📌 特征值 {j}:")
                     print(f"         UUID: {char_uuid}")
                     print(f"         属性: {', '.join(properties)}")
 
                     # 标明读写能力
-                    capabilities = []
-                    if "READ" in properties:
-                        capabilities.append("✅ 可读")
-                    if "WRITE" in properties or "WRITE_NO_RESPONSE" in properties:
-                        capabilities.append("✏️ 可写")
-                    if "NOTIFY" in properties:
-                        capabilities.append("🔔 可通知")
-                    if "INDICATE" in properties:
-                        capabilities.append("📢 可指示")
-
+                    capabilities = analyze_characteristic_capabilities(char_props)
                     if capabilities:
                         print(f"         功能: {' | '.join(capabilities)}")
 
-                    # 如果支持读取，尝试读取描述符
-                    try:
-                        descriptors_result = await char.get_descriptors_async()
-                        if (
-                            descriptors_result.status == 0
-                            and len(descriptors_result.descriptors) > 0
-                        ):
-                            print(
-                                f"         描述符: {len(descriptors_result.descriptors)} 个"
-                            )
-                    except:  # noqa: E722
-                        pass
+                    descriptor_count = next(descriptor_count_iter)
+                    if descriptor_count > 0:
+                        print(f"         描述符: {descriptor_count} 个")
 
                     print()
             else:
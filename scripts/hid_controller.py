@@ -1,75 +1,213 @@
+import functools
 import hid
+import logging
+import re
+import sys
+import threading
 import time
-from typing import Optional, List, Tuple
+from typing import Callable, Dict, Iterable, Optional, List, Set, Tuple
+
+try:
+    import pyudev  # Linux 下的热插拔监听（可选）
+except ImportError:
+    pyudev = None
+
+LOG_LEVEL = logging.INFO  # 设为 logging.DEBUG 可输出每次收发的报告数据
+
+logger = logging.getLogger(__name__)
+
+# 已知的 BS2PRO 设备 ID（USB 厂商ID为16位，与 Go 端 device.VendorID 一致）
+BS2PRO_VENDOR_ID = 0x37D7
+BS2PRO_PRODUCT_ID = 0x1002
+
+# 已知的 BS2PRO 设备信息
+KNOWN_BS2PRO_DEVICES = {
+    (BS2PRO_VENDOR_ID, BS2PRO_PRODUCT_ID): "FlyDigi BS2PRO",
+}
+
+# 扩展搜索条件（大写）
+SEARCH_TERMS = ("BS2PRO", "FLYDIGI", "FLY", "CONTROLLER", "GAMEPAD")
+# 所有搜索条件编译为一个不区分大小写的正则，一次扫描完成匹配
+_SEARCH_TERMS_RE = re.compile("|".join(map(re.escape, SEARCH_TERMS)), re.IGNORECASE)
+
+# 常见的游戏手柄厂商ID
+COMMON_GAMEPAD_VENDORS = frozenset(
+    (
+        0x2DC8,  # 8BitDo
+        0x045E,  # Microsoft
+        0x054C,  # Sony
+        0x057E,  # Nintendo
+        0x0F0D,  # Hori
+        0x28DE,  # Valve
+        0x37D7,  # FlyDigi
+    )
+)
+
+# hid.enumerate() 结果的缓存时间（秒），避免短时间内重复遍历整个 USB 总线
+ENUMERATE_CACHE_TTL = 3.0
+
+# 连续设置转速时写入失败后的重试等待时间（秒）
+STREAM_RETRY_BACKOFF = 0.005
+
+# 进入实时转速模式后到发送首个转速前的等待时间（秒），与 Go 端 SetCustomFanSpeed 一致
+REALTIME_MODE_SETTLE = 0.05
+
+_enum_cache: Optional[Tuple[float, List[dict]]] = None
+# 按 (VID, PID) 记录已知 BS2PRO 设备的路径，连接时可直接按路径打开
+_known_paths: Dict[Tuple[int, int], bytes] = {}
+
+
+def _cached_enumerate(ttl: float = ENUMERATE_CACHE_TTL) -> List[dict]:
+    """带短时缓存的 hid.enumerate()"""
+    global _enum_cache
+    now = time.monotonic()
+    if _enum_cache is None or now - _enum_cache[0] > ttl:
+        _enum_cache = (now, hid.enumerate())
+    return _enum_cache[1]
+
+
+def _invalidate_enumerate_cache():
+    """清除枚举缓存，设备插拔后下次查找会重新枚举"""
+    global _enum_cache
+    _enum_cache = None
+    _known_paths.clear()
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_command(
+    hex_string: str, report_id: int = 0x02, padding_length: int = 23
+) -> bytes:
+    """将十六进制命令编译为可直接写入的输出报告（报告ID + 有效载荷 + 0填充）
+
+    结果会被缓存，重复发送相同命令时无需再次解析
+    """
+    # 去除空格并转换为bytes
+    payload = bytes.fromhex(hex_string.replace(" ", "").replace("0x", ""))
+    payload_length = len(payload)
+
+    # 一次分配已0填充的完整报告（报告ID(1字节) + 有效载荷 + 填充），再原地写入
+    command = bytearray(max(padding_length, payload_length + 1))
+    command[0] = report_id
+    command[1 : payload_length + 1] = payload
+    return bytes(command)
+
+
+# 预设命令在导入时一次性打包，发送时直接写入
+_ENTER_RT_SPEED = _compile_command("5aa523022500000000000000000000000000000000000000")
+
+_GEAR_CMDS = {
+    key: _compile_command(hex_string)
+    for key, hex_string in {
+        (1, 1): "5aa526050014054400000000000000000000000000000000",
+        (1, 2): "5aa5260500a406d500000000000000000000000000000000",
+        (1, 3): "5aa52605006c079e00000000000000000000000000000000",
+        (2, 1): "5aa526050134086800000000000000000000000000000000",
+        (2, 2): "5aa526050160099500000000000000000000000000000000",
+        (2, 3): "5aa52605018c0ac200000000000000000000000000000000",
+        (3, 1): "5aa5260502f00a2700000000000000000000000000000000",
+        (3, 2): "5aa5260502b80bf000000000000000000000000000000000",
+        (3, 3): "5aa5260502e40c1d00000000000000000000000000000000",
+        (4, 1): "5aa5260503ac0de700000000000000000000000000000000",
+        (4, 2): "5aa5260503740eb000000000000000000000000000000000",
+        (4, 3): "5aa5260503a00fdd00000000000000000000000000000000",
+    }.items()
+}
+
+# (关闭, 开启)
+_GEAR_LIGHT = (
+    _compile_command("5aa54803004b000000000000000000000000000000000000"),
+    _compile_command("5aa54803014c000000000000000000000000000000000000"),
+)
+
+# (关闭, 开启)
+_POWER_ON = (
+    _compile_command("5aa50c030110000000000000000000000000000000000000"),
+    _compile_command("5aa50c030211000000000000000000000000000000000000"),
+)
+
+_SMART_START = {
+    "off": _compile_command("5aa50d030010000000000000000000000000000000000000"),
+    "immediate": _compile_command("5aa50d030111000000000000000000000000000000000000"),
+    "delayed": _compile_command("5aa50d030212000000000000000000000000000000000000"),
+}
+
+_BRIGHT = {
+    0: _compile_command("5aa5470d1c00ff00000000000000006f0000000000000000"),
+    100: _compile_command("5aa543024500000000000000000000000000000000000000"),
+}
 
 
 class BS2PROHIDController:
     """BS2PRO HID 控制器"""
 
+    # 转速命令模板：报告ID + 5aa52104 + 转速(2) + 校验和(1) + 0填充，共24字节
+    _SPEED_TEMPLATE = bytes([0x02, 0x5A, 0xA5, 0x21, 0x04]) + bytes(19)
+    # 校验和中的固定部分: 0x5A + 0xA5 + 0x21 + 0x04 + 1
+    _SPEED_CHECKSUM_BASE = 0x125
+    # 输入报告最大长度
+    REPORT_SIZE = 64
+
     def __init__(self):
         self.device = None
         self.vendor_id = None
         self.product_id = None
+        self._nonblocking = False
+        # 输入报告接收缓冲区，读取时复用
+        self._rx_buf = bytearray(self.REPORT_SIZE)
+        self._rx_view = memoryview(self._rx_buf)
+        # 热插拔监听线程 (pyudev.MonitorObserver)
+        self._hotplug = None
+        # 串行化连接过程，热插拔回调在后台线程中执行
+        self._connect_lock = threading.RLock()
 
     def find_bs2pro_devices(self) -> List[Tuple[int, int, str]]:
         """查找所有可能的 BS2PRO HID 设备"""
         devices = []
+        seen: Set[Tuple[int, int]] = set()
 
         print("查找 BS2PRO HID 设备...")
 
-        # 添加已知的 BS2PRO 设备信息
-        known_bs2pro_devices = [
-            (0x137D7, 0x1002, "FlyDigi BS2PRO"),
-        ]
-
-        # 枚举所有设备并查找匹配项
-        for device_info in hid.enumerate():
+        # 第一阶段：按已知 VID/PID 过滤枚举，找到即返回
+        for (known_vid, known_pid), known_name in KNOWN_BS2PRO_DEVICES.items():
+            matches = hid.enumerate(known_vid, known_pid)
+            if not matches:
+                continue
+            # 同一设备的多个接口只记录一次
+            device_info = matches[0]
+            devices.append((known_vid, known_pid, known_name))
+            if device_info.get("path"):
+                _known_paths[(known_vid, known_pid)] = device_info["path"]
+            print(f"找到已知 BS2PRO 设备:")
+            print(f"  厂商ID: 0x{known_vid:04X}")
+            print(f"  产品ID: 0x{known_pid:04X}")
+            print(f"  制造商: {device_info.get('manufacturer_string', '')}")
+            print(f"  产品名: {device_info.get('product_string', '')}")
+            print("-" * 40)
+
+        if devices:
+            return devices
+
+        # 第二阶段：未找到已知设备时，枚举所有设备查找潜在匹配项
+        for device_info in _cached_enumerate():
             vendor_id = device_info.get("vendor_id", 0)
             product_id = device_info.get("product_id", 0)
+            key = (vendor_id, product_id)
+            # 同一设备的多个接口只记录一次
+            if key in seen:
+                continue
+
             manufacturer = device_info.get("manufacturer_string", "")
             product_name = device_info.get("product_string", "")
 
-            # 首先检查已知设备
-            for known_vid, known_pid, known_name in known_bs2pro_devices:
-                if vendor_id == known_vid and product_id == known_pid:
-                    devices.append((vendor_id, product_id, known_name))
-                    print(f"找到已知 BS2PRO 设备:")
-                    print(f"  厂商ID: 0x{vendor_id:04X}")
-                    print(f"  产品ID: 0x{product_id:04X}")
-                    print(f"  制造商: {manufacturer}")
-                    print(f"  产品名: {product_name}")
-                    print("-" * 40)
-                    continue
-
-            # 扩展搜索条件
-            search_terms = ["BS2PRO", "FLYDIGI", "FLY", "CONTROLLER", "GAMEPAD"]
-            is_match = False
-
-            for term in search_terms:
-                if (
-                    term in str(manufacturer).upper()
-                    or term in str(product_name).upper()
-                ):
-                    is_match = True
-                    break
+            # 扩展搜索条件，也检查常见的游戏手柄厂商ID
+            is_match = (
+                vendor_id in COMMON_GAMEPAD_VENDORS
+                or _SEARCH_TERMS_RE.search(f"{manufacturer}\0{product_name}")
+                is not None
+            )
 
-            # 也检查常见的游戏手柄厂商ID
-            common_gamepad_vendors = [
-                0x2DC8,  # 8BitDo
-                0x045E,  # Microsoft
-                0x054C,  # Sony
-                0x057E,  # Nintendo
-                0x0F0D,  # Hori
-                0x28DE,  # Valve
-                0x137D7,  # FlyDigi
-            ]
-
-            if vendor_id in common_gamepad_vendors:
-                is_match = True
-
-            if is_match and (vendor_id, product_id) not in [
-                (v, p) for v, p, _ in devices
-            ]:
+            if is_match:
+                seen.add(key)
                 devices.append(
                     (
                         vendor_id,
@@ -92,6 +230,11 @@ class BS2PROHIDController:
         """连接到设备"""
         try:
             if vendor_id is None or product_id is None:
+                # 先直接按已知 ID 打开，无需枚举设备
+                print("尝试直接连接已知 BS2PRO 设备...")
+                if self._try_connect(BS2PRO_VENDOR_ID, BS2PRO_PRODUCT_ID):
+                    return True
+
                 # 查找潜在的 BS2PRO 设备
                 devices = self.find_bs2pro_devices()
                 if not devices:
@@ -115,104 +258,222 @@ class BS2PROHIDController:
             print(f"连接过程出错: {e}")
             return False
 
-    def _try_connect(self, vendor_id: int, product_id: int) -> bool:
-        """尝试连接到指定的设备"""
+    def _resolve_path(self, vendor_id: int, product_id: int) -> Optional[bytes]:
+        """查找设备路径，未记录且枚举缓存不存在或已过期时返回 None（不触发枚举）"""
+        path = _known_paths.get((vendor_id, product_id))
+        if path is not None:
+            return path
+        if (
+            _enum_cache is None
+            or time.monotonic() - _enum_cache[0] > ENUMERATE_CACHE_TTL
+        ):
+            return None
+        for device_info in _enum_cache[1]:
+            if (
+                device_info["vendor_id"] == vendor_id
+                and device_info["product_id"] == product_id
+            ):
+                return device_info.get("path")
+        return None
+
+    def _open_by_path(self, path: bytes) -> bool:
+        """按设备路径打开设备"""
         try:
-            self.device = hid.device()
-            self.device.open(vendor_id, product_id)
-            self.vendor_id = vendor_id
-            self.product_id = product_id
-
-            # 获取设备信息
-            manufacturer = self.device.get_manufacturer_string() or "Unknown"
-            product = self.device.get_product_string() or "Unknown"
-
-            print(f"连接成功!")
-            print(f"  制造商: {manufacturer}")
-            print(f"  产品: {product}")
-            print(f"  厂商ID: 0x{vendor_id:04X}")
-            print(f"  产品ID: 0x{product_id:04X}")
-
+            self.device.open_path(path)
             return True
-
         except Exception as e:
-            print(f"连接到 0x{vendor_id:04X}:0x{product_id:04X} 失败: {e}")
-            if self.device:
-                try:
-                    self.device.close()
-                except:
-                    pass
-                self.device = None
+            logger.debug("按路径 %r 打开设备失败: %s", path, e)
             return False
 
+    def _try_connect(self, vendor_id: int, product_id: int) -> bool:
+        """尝试连接到指定的设备"""
+        with self._connect_lock:
+            try:
+                self.device = hid.device()
+                # 枚举缓存中已有设备路径时直接按路径打开，避免底层再次枚举
+                path = self._resolve_path(vendor_id, product_id)
+                if path is None or not self._open_by_path(path):
+                    # 记录的路径已失效时丢弃，回退到按 VID/PID 打开
+                    _known_paths.pop((vendor_id, product_id), None)
+                    self.device.open(vendor_id, product_id)
+                # 连接时设定一次阻塞模式，read() 的超时参数才能按预期生效
+                self.device.set_nonblocking(False)
+                self._nonblocking = False
+                self.vendor_id = vendor_id
+                self.product_id = product_id
+
+                # 获取设备信息
+                manufacturer = self.device.get_manufacturer_string() or "Unknown"
+                product = self.device.get_product_string() or "Unknown"
+
+                print(f"连接成功!")
+                print(f"  制造商: {manufacturer}")
+                print(f"  产品: {product}")
+                print(f"  厂商ID: 0x{vendor_id:04X}")
+                print(f"  产品ID: 0x{product_id:04X}")
+
+                return True
+
+            except Exception as e:
+                print(f"连接到 0x{vendor_id:04X}:0x{product_id:04X} 失败: {e}")
+                # 设备可能已被拔出或重新插入，下次查找时重新枚举
+                _invalidate_enumerate_cache()
+                if self.device:
+                    try:
+                        self.device.close()
+                    except:
+                        pass
+                    self.device = None
+                return False
+
     def send_feature_report(self, report_id: int, data: bytes) -> bool:
         """发送特性报告"""
         try:
             if not self.device:
-                print("设备未连接")
+                logger.error("设备未连接")
                 return False
 
-            # 构造报告（报告ID + 数据）
-            report = bytes([report_id]) + data
+            # 构造报告（报告ID + 数据），一次分配
+            report = bytearray(len(data) + 1)
+            report[0] = report_id
+            report[1:] = data
             result = self.device.send_feature_report(report)
-            print(f"发送特性报告成功: 报告ID={report_id}, 长度={result}")
+            logger.debug("发送特性报告成功: 报告ID=%d, 长度=%s", report_id, result)
             return True
 
         except Exception as e:
-            print(f"发送特性报告失败: {e}")
+            logger.error("发送特性报告失败: %s", e)
             return False
 
     def get_feature_report(self, report_id: int, length: int = 64) -> Optional[bytes]:
         """获取特性报告"""
         try:
             if not self.device:
-                print("设备未连接")
+                logger.error("设备未连接")
                 return None
 
-            report = self.device.get_feature_report(report_id, length)
-            print(f"接收特性报告: 报告ID={report_id}, 数据={bytes(report).hex()}")
-            return bytes(report)
+            report = bytes(self.device.get_feature_report(report_id, length))
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "接收特性报告: 报告ID=%d, 数据=%s", report_id, report.hex()
+                )
+            return report
 
         except Exception as e:
-            print(f"获取特性报告失败: {e}")
+            logger.error("获取特性报告失败: %s", e)
             return None
 
     def send_output_report(self, data: bytes) -> bool:
         """发送输出报告"""
-        try:
-            if not self.device:
-                print("设备未连接")
-                return False
+        if not self.device:
+            logger.error("设备未连接")
+            return False
+        write = self.device.write
 
-            result = self.device.write(data)
-            print(f"发送输出报告成功: 长度={result}")
+        try:
+            result = write(data)
+            logger.debug("发送输出报告成功: 长度=%s", result)
             return True
 
         except Exception as e:
-            print(f"发送输出报告失败: {e}")
+            logger.error("发送输出报告失败: %s", e)
             return False
 
-    def read_input_report(self, timeout: int = 1000) -> Optional[bytes]:
-        """读取输入报告"""
+    def set_nonblocking(self, nonblocking: bool) -> bool:
+        """设置读取模式，仅在模式变化时下发到设备"""
+        if not self.device:
+            logger.error("设备未连接")
+            return False
+        if nonblocking != self._nonblocking:
+            self.device.set_nonblocking(nonblocking)
+            self._nonblocking = nonblocking
+        return True
+
+    def read_input_report_into(self, timeout: int = 1000) -> int:
+        """读取输入报告到内部缓冲区 self._rx_buf，不分配新的 bytes 对象
+
+        Args:
+            timeout: 超时（毫秒），<= 0 时不等待，无数据立即返回
+
+        Returns:
+            读取的字节数，超时或无数据时为0，出错时为-1
+        """
         try:
             if not self.device:
-                print("设备未连接")
-                return None
-
-            # 设置非阻塞模式
-            self.device.set_nonblocking(True)
-            data = self.device.read(64, timeout)
+                logger.error("设备未连接")
+                return -1
 
-            if data:
-                print(f"接收输入报告: 数据={bytes(data).hex()}")
-                return bytes(data)
+            # read(n, 0) 调用 hid_read()，阻塞模式下会一直等待，
+            # 因此不等待的读取临时切换到非阻塞模式；带超时的读取不受该模式影响
+            if timeout > 0:
+                data = self.device.read(self.REPORT_SIZE, timeout)
             else:
-                print("未接收到输入报告（超时或无数据）")
-                return None
+                prev_nonblocking = self._nonblocking
+                self.set_nonblocking(True)
+                try:
+                    data = self.device.read(self.REPORT_SIZE, 0)
+                finally:
+                    # 恢复调用前的读取模式
+                    self.set_nonblocking(prev_nonblocking)
+            length = len(data)
+
+            if length:
+                self._rx_buf[:length] = data
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("接收输入报告: 数据=%s", self._rx_view[:length].hex())
+            else:
+                logger.debug("未接收到输入报告（超时或无数据）")
+            return length
 
         except Exception as e:
-            print(f"读取输入报告失败: {e}")
+            logger.error("读取输入报告失败: %s", e)
+            return -1
+
+    def read_input_report(self, timeout: int = 1000) -> Optional[bytes]:
+        """读取输入报告"""
+        length = self.read_input_report_into(timeout)
+        if length <= 0:
             return None
+        return bytes(self._rx_view[:length])
+
+    def drain_input_reports(
+        self, max_reports: int = 256, timeout_ms: int = 0
+    ) -> List[bytes]:
+        """一次性读取所有已排队的输入报告
+
+        Args:
+            max_reports: 单次最多读取的报告数
+            timeout_ms: 等待第一个报告的超时（毫秒），0 表示不等待
+
+        Returns:
+            读取到的输入报告列表，无数据时为空
+        """
+        reports = []
+        if not self.device:
+            logger.error("设备未连接")
+            return reports
+
+        prev_nonblocking = self._nonblocking
+        try:
+            # 非阻塞模式下逐个取出系统已排队的报告，直到队列为空
+            self.set_nonblocking(True)
+            read = self.device.read
+            size = self.REPORT_SIZE
+            timeout = timeout_ms
+            while len(reports) < max_reports:
+                data = read(size, timeout)
+                if not data:
+                    break
+                reports.append(bytes(data))
+                timeout = 0
+        except Exception as e:
+            logger.error("读取输入报告失败: %s", e)
+        finally:
+            # 恢复调用前的读取模式
+            self.set_nonblocking(prev_nonblocking)
+
+        logger.debug("批量读取输入报告: %d 个", len(reports))
+        return reports
 
     def send_hex_command(
         self, hex_string: str, report_id: int = 0x02, padding_length: int = 23
@@ -225,29 +486,22 @@ class BS2PROHIDController:
             padding_length: 总长度，不足时用0填充
         """
         try:
-            # 去除空格并转换为bytes
-            hex_string = hex_string.replace(" ", "").replace("0x", "")
-            payload = bytes.fromhex(hex_string)
-
-            # 计算需要填充的长度（总长度 - 报告ID(1字节) - 有效载荷长度）
-            padding_needed = padding_length - 1 - len(payload)
-            if padding_needed < 0:
-                print(
-                    f"警告: 命令长度({len(payload)})超过最大允许长度({padding_length-1})"
+            command = _compile_command(hex_string, report_id, padding_length)
+            if len(command) > padding_length:
+                logger.warning(
+                    "命令长度(%d)超过最大允许长度(%d)",
+                    len(command) - 1,
+                    padding_length - 1,
                 )
-                padding_needed = 0
-
-            padding = bytes(padding_needed)
-            command = bytes([report_id]) + payload + padding
 
-            print(f"发送命令: {hex_string} (总长度: {len(command)})")
+            logger.debug("发送命令: %s (总长度: %d)", hex_string, len(command))
             return self.send_output_report(command)
 
         except ValueError as e:
-            print(f"十六进制格式错误: {e}")
+            logger.error("十六进制格式错误: %s", e)
             return False
         except Exception as e:
-            print(f"发送命令失败: {e}")
+            logger.error("发送命令失败: %s", e)
             return False
 
     def send_multiple_commands(self, commands: List[str], delay: float = 0.1) -> int:
@@ -260,47 +514,38 @@ class BS2PROHIDController:
         Returns:
             成功发送的命令数量
         """
+        # 去除空行
+        cmds = [c for c in (cmd.strip() for cmd in commands) if c]
+        total = len(cmds)
         success_count = 0
-
-        for i, cmd in enumerate(commands):
-            cmd = cmd.strip()
-            if not cmd:  # 跳过空行
-                continue
-
-            print(f"\n命令 {i+1}/{len(commands)}: {cmd}")
-            if self.send_hex_command(cmd):
+        deadline = 0.0
+        # 循环内频繁调用的方法绑定到局部变量
+        send = self.send_hex_command
+        _sleep = time.sleep
+        _now = time.monotonic
+
+        for i, cmd in enumerate(cmds, 1):
+            # 按单调时钟截止时间控制间隔，发送耗时计入命令间延迟
+            remaining = deadline - _now()
+            if remaining > 0:
+                _sleep(remaining)
+            deadline = _now() + delay
+
+            print(f"\n命令 {i}/{total}: {cmd}")
+            if send(cmd):
                 success_count += 1
 
-            # 命令间延迟
-            if delay > 0 and i < len(commands) - 1:
-                time.sleep(delay)
-
-        print(
-            f"\n完成! 成功发送 {success_count}/{len([c for c in commands if c.strip()])} 个命令"
-        )
+        print(f"\n完成! 成功发送 {success_count}/{total} 个命令")
         return success_count
 
     def calculate_checksum(self, rpm: int) -> int:
-        """计算转速指令的校验和"""
-        # 构造前6个字节：5aa52104 + 转速的小端序字节
-        speed_bytes = rpm.to_bytes(2, "little")
-
-        # 前6个字节
-        byte0 = 0x5A
-        byte1 = 0xA5
-        byte2 = 0x21
-        byte3 = 0x04
-        byte4 = speed_bytes[0]  # 转速低字节
-        byte5 = speed_bytes[1]  # 转速高字节
-
-        # 校验字节 = (前6字节的和 + 1) & 0xFF
-        checksum = (byte0 + byte1 + byte2 + byte3 + byte4 + byte5 + 1) & 0xFF
-        return checksum
+        """计算转速指令的校验和: (5aa52104 + 转速小端序2字节 + 1) & 0xFF"""
+        return (self._SPEED_CHECKSUM_BASE + (rpm & 0xFF) + (rpm >> 8)) & 0xFF
 
     def enter_realtime_speed_mode(self) -> bool:
         """进入实时转速更改模式"""
         print("进入实时转速更改模式...")
-        return self.send_hex_command("5aa523022500000000000000000000000000000000000000")
+        return self.send_output_report(_ENTER_RT_SPEED)
 
     def set_fan_speed(self, rpm: int) -> bool:
         """设置风扇转速
@@ -312,21 +557,86 @@ class BS2PROHIDController:
             print(f"转速值超出范围: {rpm} (有效范围: 0-65535)")
             return False
 
-        # 将转速转换为小端序字节
-        speed_bytes = rpm.to_bytes(2, "little")
+        # 在命令模板上直接填入转速（小端序）与校验和
+        low = rpm & 0xFF
+        high = rpm >> 8
+        buf = bytearray(self._SPEED_TEMPLATE)
+        buf[5] = low
+        buf[6] = high
+        buf[7] = (self._SPEED_CHECKSUM_BASE + low + high) & 0xFF
+
+        logger.debug("设置风扇转速: %d RPM", rpm)
+
+        return self.send_output_report(bytes(buf))
+
+    def stream_fan_speeds(
+        self,
+        rpms: Iterable[int],
+        min_interval_s: float = 0.001,
+        settle_s: float = REALTIME_MODE_SETTLE,
+    ) -> int:
+        """连续设置风扇转速
+
+        只进入一次实时转速模式，等待设备切换模式后按最小间隔依次写入每个转速，
+        写入失败时稍作等待并重试一次。
+
+        Args:
+            rpms: 转速值序列
+            min_interval_s: 相邻两个转速写入之间的最小间隔（秒）
+            settle_s: 进入实时转速模式后到首个转速写入前的等待时间（秒）
+
+        Returns:
+            成功写入的转速数量
+        """
+        if not self.device:
+            logger.error("设备未连接")
+            return 0
+        if not self.enter_realtime_speed_mode():
+            return 0
+        time.sleep(settle_s)
+
+        # 循环内频繁使用的属性绑定到局部变量
+        write = self.device.write
+        tmpl = self._SPEED_TEMPLATE
+        BASE = self._SPEED_CHECKSUM_BASE
+        _sleep = time.sleep
+        _now = time.monotonic
+        buf = bytearray(tmpl)
+        sent = 0
+        deadline = 0.0
+
+        for rpm in rpms:
+            if not isinstance(rpm, int) or not 0 <= rpm <= 65535:
+                logger.warning("无效的转速值: %r (有效范围: 0-65535)", rpm)
+                continue
 
-        # 计算校验和
-        checksum = self.calculate_checksum(rpm)
+            low = rpm & 0xFF
+            high = rpm >> 8
+            buf[5] = low
+            buf[6] = high
+            buf[7] = (BASE + low + high) & 0xFF
+            data = bytes(buf)
 
-        # 构造完整命令
-        command = (
-            f"5aa52104{speed_bytes.hex()}{checksum:02x}00000000000000000000000000000000"
-        )
+            remaining = deadline - _now()
+            if remaining > 0:
+                _sleep(remaining)
+
+            for attempt in range(2):
+                try:
+                    if write(data) > 0:
+                        sent += 1
+                        break
+                except Exception as e:
+                    logger.warning("写入转速 %d RPM 失败: %s", rpm, e)
+                if attempt == 0:
+                    _sleep(STREAM_RETRY_BACKOFF)
+            else:
+                logger.error("设置风扇转速失败: %d RPM", rpm)
 
-        print(f"设置风扇转速: {rpm} RPM")
-        print(f"命令: {command}")
+            deadline = _now() + min_interval_s
 
-        return self.send_hex_command(command)
+        logger.debug("连续设置风扇转速: 成功 %d 个", sent)
+        return sent
 
     def set_gear_position(self, gear: int, position: int) -> bool:
         """设置挡位
@@ -335,49 +645,24 @@ class BS2PROHIDController:
             gear: 档位 (1-4)
             position: 档位内位置 (1-3)
         """
-        gear_positions = {
-            (1, 1): "5aa526050014054400000000000000000000000000000000",
-            (1, 2): "5aa5260500a406d500000000000000000000000000000000",
-            (1, 3): "5aa52605006c079e00000000000000000000000000000000",
-            (2, 1): "5aa526050134086800000000000000000000000000000000",
-            (2, 2): "5aa526050160099500000000000000000000000000000000",
-            (2, 3): "5aa52605018c0ac200000000000000000000000000000000",
-            (3, 1): "5aa5260502f00a2700000000000000000000000000000000",
-            (3, 2): "5aa5260502b80bf000000000000000000000000000000000",
-            (3, 3): "5aa5260502e40c1d00000000000000000000000000000000",
-            (4, 1): "5aa5260503ac0de700000000000000000000000000000000",
-            (4, 2): "5aa5260503740eb000000000000000000000000000000000",
-            (4, 3): "5aa5260503a00fdd00000000000000000000000000000000",
-        }
-
-        if (gear, position) not in gear_positions:
+        command = _GEAR_CMDS.get((gear, position))
+        if command is None:
             print(f"无效的挡位设置: {gear}档位{position}")
             print("有效范围: 1-4档，每档1-3个位置")
             return False
 
-        command = gear_positions[(gear, position)]
         print(f"设置挡位: {gear}档位{position}")
-        return self.send_hex_command(command)
+        return self.send_output_report(command)
 
     def set_gear_light(self, enabled: bool) -> bool:
         """设置挡位灯开关"""
-        if enabled:
-            command = "5aa54803014c000000000000000000000000000000000000"
-            print("开启挡位灯")
-        else:
-            command = "5aa54803004b000000000000000000000000000000000000"
-            print("关闭挡位灯")
-        return self.send_hex_command(command)
+        print("开启挡位灯" if enabled else "关闭挡位灯")
+        return self.send_output_report(_GEAR_LIGHT[bool(enabled)])
 
     def set_power_on_start(self, enabled: bool) -> bool:
         """设置通电自启动"""
-        if enabled:
-            command = "5aa50c030211000000000000000000000000000000000000"
-            print("开启通电自启动")
-        else:
-            command = "5aa50c030110000000000000000000000000000000000000"
-            print("关闭通电自启动")
-        return self.send_hex_command(command)
+        print("开启通电自启动" if enabled else "关闭通电自启动")
+        return self.send_output_report(_POWER_ON[bool(enabled)])
 
     def set_smart_start_stop(self, mode: str) -> bool:
         """设置智能启停
@@ -385,19 +670,14 @@ class BS2PROHIDController:
         Args:
             mode: 'off', 'immediate', 'delayed'
         """
-        commands = {
-            "off": "5aa50d030010000000000000000000000000000000000000",
-            "immediate": "5aa50d030111000000000000000000000000000000000000",
-            "delayed": "5aa50d030212000000000000000000000000000000000000",
-        }
-
-        if mode not in commands:
+        command = _SMART_START.get(mode)
+        if command is None:
             print(f"无效的智能启停模式: {mode}")
             print("有效模式: 'off', 'immediate', 'delayed'")
             return False
 
         print(f"设置智能启停: {mode}")
-        return self.send_hex_command(commands[mode])
+        return self.send_output_report(command)
 
     def set_brightness(self, percentage: int) -> bool:
         """设置灯光亮度
@@ -405,27 +685,100 @@ class BS2PROHIDController:
         Args:
             percentage: 亮度百分比 (0-100)
         """
-        if percentage == 0:
-            command = "5aa5470d1c00ff00000000000000006f0000000000000000"
-            print("设置亮度: 0%")
-        elif percentage == 100:
-            command = "5aa543024500000000000000000000000000000000000000"
-            print("设置亮度: 100%")
-        else:
+        command = _BRIGHT.get(percentage)
+        if command is None:
             print(f"当前仅支持0%和100%亮度设置")
             return False
 
-        return self.send_hex_command(command)
+        print(f"设置亮度: {percentage}%")
+        return self.send_output_report(command)
+
+    def enable_hotplug(self, on_arrival: Callable[[], None]) -> bool:
+        """监听已知 BS2PRO 设备的插拔事件，接入时直接连接而不枚举总线
+
+        目前的 Python hidapi 绑定没有热插拔接口，仅在 Linux 下通过 pyudev 监听 hidraw 设备。
+        设备拔出时关闭当前连接，重新接入后自动重连。
+        回调在监听线程中执行，连接与关闭由 _connect_lock 串行化；
+        主线程的读写不加锁，设备在读写期间被拔出时该次读写失败，之后按未连接处理。
+
+        Args:
+            on_arrival: 设备接入并连接成功后调用
+
+        Returns:
+            是否成功启用热插拔监听
+        """
+        if self._hotplug is not None:
+            return True
+
+        def handle_arrival(vendor_id: int, product_id: int):
+            if (vendor_id, product_id) not in KNOWN_BS2PRO_DEVICES:
+                return
+            with self._connect_lock:
+                if self.device or not self._try_connect(vendor_id, product_id):
+                    return
+            on_arrival()
+
+        def handle_removal(vendor_id: int, product_id: int):
+            if (vendor_id, product_id) != (self.vendor_id, self.product_id):
+                return
+            if self._close_device():
+                print("设备已拔出，等待重新接入...")
+
+        if pyudev is not None:
+            monitor = pyudev.Monitor.from_netlink(pyudev.Context())
+            monitor.filter_by(subsystem="hidraw")
+
+            def on_udev_event(udev_device):
+                action = udev_device.action
+                if action not in ("add", "remove"):
+                    return
+                parent = udev_device.find_parent("hid")
+                hid_id = parent.properties.get("HID_ID") if parent else None
+                if not hid_id:
+                    return
+                # HID_ID 格式: 总线:厂商ID:产品ID（十六进制）
+                _, vendor_id, product_id = hid_id.split(":")
+                key = (int(vendor_id, 16), int(product_id, 16))
+                if action == "add":
+                    handle_arrival(*key)
+                else:
+                    handle_removal(*key)
+
+            self._hotplug = pyudev.MonitorObserver(
+                monitor, callback=on_udev_event, name="bs2pro-hotplug"
+            )
+            self._hotplug.daemon = True
+            self._hotplug.start()
+            print("已启用 udev 热插拔监听")
+            return True
+
+        print("当前环境不支持热插拔监听")
+        return False
+
+    def disable_hotplug(self):
+        """停止热插拔监听"""
+        if self._hotplug is not None:
+            self._hotplug.stop()
+            self._hotplug = None
 
     def disconnect(self):
         """断开连接"""
-        if self.device:
+        # 先停止热插拔监听，避免主动断开后又被自动重连
+        self.disable_hotplug()
+        if self._close_device():
+            print("设备已断开连接")
+
+    def _close_device(self) -> bool:
+        """关闭当前设备，返回是否有设备被关闭"""
+        with self._connect_lock:
+            if not self.device:
+                return False
             try:
                 self.device.close()
             except:
                 pass
             self.device = None
-            print("设备已断开连接")
+            return True
 
 
 def test_bs2pro_with_commands():
@@ -436,7 +789,7 @@ def test_bs2pro_with_commands():
     print("=" * 50)
 
     # 直接使用已知的厂商ID和产品ID
-    if not controller.connect(0x137D7, 0x1002):
+    if not controller.connect(BS2PRO_VENDOR_ID, BS2PRO_PRODUCT_ID):
         print("无法连接到 BS2PRO 设备")
         return False
 
@@ -456,7 +809,7 @@ def test_bs2pro_with_commands():
     print("  (按住手柄按键可能会看到数据...)")
     for i in range(3):
         response = controller.read_input_report(1000)
-        if response and any(response):
+        if response and response.strip(b"\x00"):
             print(f"  输入 {i+1}: {response[:16].hex()}...")
             break
         else:
@@ -467,6 +820,31 @@ def test_bs2pro_with_commands():
     return True
 
 
+def _do_quit(controller: BS2PROHIDController) -> bool:
+    """退出交互模式"""
+    return True
+
+
+def _do_listen(controller: BS2PROHIDController) -> bool:
+    """监听输入数据 5 秒"""
+    print("监听模式 (5秒)...")
+    for i in range(5):
+        # 每秒批量取出一次期间排队的所有报告
+        time.sleep(1)
+        reports = [r for r in controller.drain_input_reports() if r.strip(b"\x00")]
+        if reports:
+            print(f"  输入: {reports[-1][:16].hex()}... (共 {len(reports)} 个报告)")
+    return False
+
+
+# 交互模式中完整匹配的命令
+_DISPATCH = {
+    "quit": _do_quit,
+    "exit": _do_quit,
+    "listen": _do_listen,
+}
+
+
 def interactive_command_mode():
     """交互式命令模式"""
     controller = BS2PROHIDController()
@@ -474,7 +852,7 @@ def interactive_command_mode():
     print("交互式命令模式")
     print("=" * 50)
 
-    if not controller.connect(0x137D7, 0x1002):
+    if not controller.connect(BS2PRO_VENDOR_ID, BS2PRO_PRODUCT_ID):
         print("无法连接到 BS2PRO 设备")
         return
 
@@ -490,35 +868,30 @@ def interactive_command_mode():
     while True:
         try:
             print("\n请输入命令:")
-            line = input().strip()
-
-            if not line:
+            cmd = input().strip()
+            if not cmd:
                 continue
+            low = cmd.lower()
 
-            if line.lower() in ["quit", "exit"]:
-                break
-
-            if line.lower() == "listen":
-                print("监听模式 (5秒)...")
-                for i in range(5):
-                    response = controller.read_input_report(1000)
-                    if response and any(response):
-                        print(f"  输入: {response[:16].hex()}...")
+            # 完整匹配的命令，处理函数返回 True 表示退出
+            handler = _DISPATCH.get(low)
+            if handler is not None:
+                if handler(controller):
+                    break
                 continue
 
-            if line.lower().startswith("speed "):
+            if low.startswith("speed "):
                 try:
-                    rpm = int(line.split()[1])
-                    controller.enter_realtime_speed_mode()
-                    time.sleep(0.1)
-                    controller.set_fan_speed(rpm)
+                    rpm = int(cmd.split()[1])
+                    if controller.stream_fan_speeds([rpm]):
+                        print(f"转速已设置: {rpm} RPM")
                 except (IndexError, ValueError):
                     print("用法: speed <rpm值>")
                 continue
 
-            if line.lower().startswith("gear "):
+            if low.startswith("gear "):
                 try:
-                    parts = line.split()
+                    parts = cmd.split()
                     gear = int(parts[1])
                     position = int(parts[2])
                     controller.set_gear_position(gear, position)
@@ -527,7 +900,8 @@ def interactive_command_mode():
                 continue
 
             # 普通十六进制命令
-            controller.send_hex_command(line)
+            if controller.send_hex_command(cmd):
+                print("命令已发送")
 
         except KeyboardInterrupt:
             print("\n\n用户中断，退出...")
@@ -539,6 +913,9 @@ def interactive_command_mode():
 
 
 if __name__ == "__main__":
+    logging.basicConfig(stream=sys.stdout, format="%(message)s")
+    logger.setLevel(LOG_LEVEL)
+
     print("选择模式:")
     print("1. 测试预设命令")
     print("2. 交互式命令模式")
@@ -0,0 +1,12 @@
+"""
+构建 BLE 数据包解析扩展
+用法: python setup.py build_ext --inplace
+"""
+
+from setuptools import setup
+from Cython.Build import cythonize
+
+setup(
+    name="bs2pro-ble-parse",
+    ext_modules=cythonize("_ble_parse.pyx", language_level=3),
+)